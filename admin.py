@@ -1,26 +1,302 @@
 """Admin panel functionality for the bot"""
+import asyncio
 import logging
 import json
+import time
+from collections import deque
+from functools import lru_cache, partial
 from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
 from telegram.ext import ContextTypes
-from database import db
+from database import db, run_db
+from throttler import throttler, reply_text
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON parsing
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 # Admin states
 ADMIN_MENU, SENDING_MESSAGE, CONFIRMING_MESSAGE, VIEWING_STATS = range(4)
 
+# Broadcasts are sent in waves to stay under Telegram's ~30 msg/s limit
+BROADCAST_BATCH_SIZE = 25
+BROADCAST_BATCH_DELAY = 1.05
+
+# Admin stats are cached for this many seconds between refreshes
+STATS_CACHE_TTL = 30
+_stats_cache = None  # (monotonic timestamp, stats dict)
+
+# UI strings by language, looked up with _t()
+DEFAULT_LANG = 'uz'
+STRINGS = {
+    'uz': {
+        'no_panel_access': "❌ Siz admin panelga kirish huquqiga ega emassiz.",
+        'no_permission': "❌ Siz ruxsati yo'q.",
+        'panel': "👨‍💼 *Admin Panel*\n\nAmalni tanlang:",
+        'ask_broadcast': (
+            "📝 Barcha foydalanuvchilarga yuborish uchun xabar yuboring:\n\n"
+            "_Admin panelga qaytish uchun /cancel yuboring_"
+        ),
+        'confirm_broadcast': (
+            "✅ Xabar qabul qilindi.\n\n"
+            "Siz bu xabarni barcha foydalanuvchilarga yubormoqchimisiz?"
+        ),
+        'message_not_found': "❌ Xabar topilmadi. Iltimos qayta urinib ko'ring.",
+        'no_users': "⚠️ Xabar yuborish uchun foydalanuvchi yo'q.",
+        'broadcast_started': (
+            "📤 {total} ta foydalanuvchiga xabar yuborish boshlandi.\n\n"
+            "Holatni ko'rish uchun 🔄 Yangilash tugmasini bosing."
+        ),
+        'broadcast_progress': (
+            "📤 *Xabar yuborilmoqda...*\n\n"
+            "✅ Yuborildi: {sent}\n"
+            "❌ Xato: {failed}\n"
+            "⏳ Qoldi: {left}\n"
+            "👥 Jami foydalanuvchilar: {total}"
+        ),
+        'broadcast_not_found': "❌ Yuborish topilmadi.",
+        'broadcast_done': (
+            "✅ *Yuborish Tamomlandi*\n\n"
+            "📊 Natijalar:\n"
+            "✅ Muvaffaqiyatli yuborildi: {success}\n"
+            "❌ Xato: {failed}\n"
+            "👥 Jami foydalanuvchilar: {total}"
+        ),
+        'stats': (
+            "📊 *Bot Statistikasi*\n\n"
+            "👥 *Foydalanuvchi Statistikasi:*\n"
+            "• Jami Foydalanuvchilar: {total}\n"
+            "• Kanalga Qo'shilganlar: {channel_joined}\n"
+            "• Faol Foydalanuvchilar: {active}\n"
+            "• ID Tasdiqlanganlar: {id_verified}\n"
+            "• Tasdiqlanmaganlar: {not_verified}\n"
+        ),
+        'stats_dates': (
+            "\n📅 *Qo'shilish Statistikasi:*\n"
+            "• Bugun (Hammasi): {today_all}\n"
+            "• Bu Hafta (Hammasi): {week_all}\n"
+            "• Kanal Bugun: {today_channel}\n"
+            "• Kanal Bu Hafta: {week_channel}\n"
+        ),
+        'reload_done': "✅ Sozlamalar yangilandi.",
+        'reload_failed': "❌ Sozlamalarni yangilashda xato.",
+        'panel_closed': "✅ Admin panel yopildi.",
+        'btn_send': "📤 Barcha foydalanuvchilarga xabar yuborish",
+        'btn_stats': "📊 Statistikani ko'rish",
+        'btn_reload': "🔄 Sozlamalarni yangilash",
+        'btn_close': "❌ Yopish",
+        'btn_confirm': "✅ Tasdiqlash va yuborish",
+        'btn_cancel': "❌ Bekor qilish",
+        'btn_back_panel': "🔙 Admin Panelga Qaytish",
+        'btn_refresh': "🔄 Yangilash",
+    },
+    'en': {
+        'no_panel_access': "❌ You don't have access to the admin panel.",
+        'no_permission': "❌ You don't have permission.",
+        'panel': "👨‍💼 *Admin Panel*\n\nChoose an action:",
+        'ask_broadcast': (
+            "📝 Send the message to broadcast to all users:\n\n"
+            "_Send /cancel to return to the admin panel_"
+        ),
+        'confirm_broadcast': (
+            "✅ Message received.\n\n"
+            "Do you want to send this message to all users?"
+        ),
+        'message_not_found': "❌ Message not found. Please try again.",
+        'no_users': "⚠️ There are no users to send the message to.",
+        'broadcast_started': (
+            "📤 Started sending the message to {total} users.\n\n"
+            "Press 🔄 Refresh to check progress."
+        ),
+        'broadcast_progress': (
+            "📤 *Sending message...*\n\n"
+            "✅ Sent: {sent}\n"
+            "❌ Failed: {failed}\n"
+            "⏳ Left: {left}\n"
+            "👥 Total users: {total}"
+        ),
+        'broadcast_not_found': "❌ Broadcast not found.",
+        'broadcast_done': (
+            "✅ *Broadcast Complete*\n\n"
+            "📊 Results:\n"
+            "✅ Sent successfully: {success}\n"
+            "❌ Failed: {failed}\n"
+            "👥 Total users: {total}"
+        ),
+        'stats': (
+            "📊 *Bot Statistics*\n\n"
+            "👥 *User Statistics:*\n"
+            "• Total Users: {total}\n"
+            "• Joined Channel: {channel_joined}\n"
+            "• Active Users: {active}\n"
+            "• ID Verified: {id_verified}\n"
+            "• Not Verified: {not_verified}\n"
+        ),
+        'stats_dates': (
+            "\n📅 *Join Statistics:*\n"
+            "• Today (All): {today_all}\n"
+            "• This Week (All): {week_all}\n"
+            "• Channel Today: {today_channel}\n"
+            "• Channel This Week: {week_channel}\n"
+        ),
+        'reload_done': "✅ Settings reloaded.",
+        'reload_failed': "❌ Failed to reload settings.",
+        'panel_closed': "✅ Admin panel closed.",
+        'btn_send': "📤 Send message to all users",
+        'btn_stats': "📊 View statistics",
+        'btn_reload': "🔄 Reload settings",
+        'btn_close': "❌ Close",
+        'btn_confirm': "✅ Confirm and send",
+        'btn_cancel': "❌ Cancel",
+        'btn_back_panel': "🔙 Back to Admin Panel",
+        'btn_refresh': "🔄 Refresh",
+    },
+}
+
+
+def _lang(context) -> str:
+    """Get the admin's UI language"""
+    lang = context.user_data.get('lang', DEFAULT_LANG)
+    return lang if lang in STRINGS else DEFAULT_LANG
+
+
+def _text(lang: str, key: str, **kwargs) -> str:
+    """Get a UI string in the given language"""
+    text = STRINGS[lang][key]
+    return text.format(**kwargs) if kwargs else text
+
+
+def _t(context, key: str, **kwargs) -> str:
+    """Get a UI string in the admin's language"""
+    return _text(_lang(context), key, **kwargs)
+
+
+# Static keyboards, built once per language (telegram objects are immutable)
+@lru_cache(maxsize=None)
+def _admin_menu_markup(lang: str) -> InlineKeyboardMarkup:
+    s = STRINGS[lang]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(s['btn_send'], callback_data='admin_send_message')],
+        [InlineKeyboardButton(s['btn_stats'], callback_data='admin_view_stats')],
+        [InlineKeyboardButton(s['btn_reload'], callback_data='admin_reload_config')],
+        [InlineKeyboardButton(s['btn_close'], callback_data='admin_close')]
+    ])
+
+
+@lru_cache(maxsize=None)
+def _confirm_markup(lang: str) -> InlineKeyboardMarkup:
+    s = STRINGS[lang]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(s['btn_confirm'], callback_data='confirm_send_message')],
+        [InlineKeyboardButton(s['btn_cancel'], callback_data='admin_cancel_send')]
+    ])
+
+
+@lru_cache(maxsize=None)
+def _back_markup(lang: str) -> InlineKeyboardMarkup:
+    s = STRINGS[lang]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(s['btn_back_panel'], callback_data='admin_back_to_panel')]
+    ])
+
+
+def _broadcast_status_markup(lang: str, job_id: int) -> InlineKeyboardMarkup:
+    s = STRINGS[lang]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(s['btn_refresh'], callback_data=f'admin_broadcast_status:{job_id}')],
+        [InlineKeyboardButton(s['btn_back_panel'], callback_data='admin_back_to_panel')]
+    ])
+
+
+@lru_cache(maxsize=None)
+def _stats_markup(lang: str) -> InlineKeyboardMarkup:
+    s = STRINGS[lang]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(s['btn_back_panel'], callback_data='admin_back_to_panel')],
+        [InlineKeyboardButton(s['btn_close'], callback_data='admin_close')]
+    ])
+
 # Load configuration
 CONFIG_PATH = Path(__file__).parent / "config.json"
 
+# Modification time of the config.json that was last parsed
+_config_mtime = None
+
+@lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from JSON file"""
-    with open(CONFIG_PATH, 'r') as f:
-        return json.load(f)
+    """Load configuration from JSON file (parsed once, see invalidate_config)"""
+    global _config_mtime
+    mtime = CONFIG_PATH.stat().st_mtime_ns
+    data = CONFIG_PATH.read_bytes()
+    if orjson is not None:
+        parsed = orjson.loads(data)
+    else:
+        parsed = json.loads(data)
+    # Only a file that parsed counts as loaded, so a broken one is retried
+    _config_mtime = mtime
+    return parsed
+
+
+# Run after every reload so other modules can rebuild what they derive from config
+_reload_hooks = []
+
+# Keys the bot can't run without; a reload missing any of them is rejected
+REQUIRED_CONFIG_KEYS = ('bot_token', 'messages', 'button_labels', 'apps', 'channels')
+
+
+def on_config_reload(hook):
+    """Register a callable to run after config.json is reloaded"""
+    _reload_hooks.append(hook)
+    return hook
+
+
+def invalidate_config():
+    """Re-read config.json, updating the shared config dict in place"""
+    # Nothing to do if the file hasn't changed since it was last parsed
+    if CONFIG_PATH.stat().st_mtime_ns == _config_mtime:
+        return config
+    load_config.cache_clear()
+    fresh = load_config()
+    missing = [key for key in REQUIRED_CONFIG_KEYS if key not in fresh]
+    if missing:
+        _forget_config()
+        raise KeyError(f"config.json is missing {', '.join(missing)}")
+    
+    previous = dict(config)
+    _apply_config(fresh)
+    try:
+        for hook in _reload_hooks:
+            hook()
+    except Exception:
+        # Put the old config back and let the hooks rebuild from it
+        _apply_config(previous)
+        for hook in _reload_hooks:
+            hook()
+        _forget_config()
+        raise
+    return config
+
+
+def _apply_config(new_config):
+    """Swap new_config into the shared config dict"""
+    global ADMIN_IDS
+    config.clear()
+    config.update(new_config)
+    ADMIN_IDS = frozenset(config.get('admin_ids', []))
+
+
+def _forget_config():
+    """Drop a rejected config.json parse so the next reload reads the file again"""
+    global _config_mtime
+    load_config.cache_clear()
+    _config_mtime = None
 
 config = load_config()
-ADMIN_IDS = config.get('admin_ids', [])
+ADMIN_IDS = frozenset(config.get('admin_ids', []))
 
 
 def is_admin(user_id: int) -> bool:
@@ -33,18 +309,13 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     user_id = update.effective_user.id
     
     if not is_admin(user_id):
-        await update.message.reply_text("❌ Siz admin panelga kirish huquqiga ega emassiz.")
+        await reply_text(update.message, _t(context, 'no_panel_access'))
         return -1
     
-    keyboard = [
-        [InlineKeyboardButton("📤 Barcha foydalanuvchilarga xabar yuborish", callback_data='admin_send_message')],
-        [InlineKeyboardButton("📊 Statistikani ko'rish", callback_data='admin_view_stats')],
-        [InlineKeyboardButton("❌ Yopish", callback_data='admin_close')]
-    ]
-    
-    await update.message.reply_text(
-        "👨‍💼 *Admin Panel*\n\nAmalni tanlang:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+    await reply_text(
+        update.message,
+        _t(context, 'panel'),
+        reply_markup=_admin_menu_markup(_lang(context)),
         parse_mode='Markdown'
     )
     
@@ -59,12 +330,11 @@ async def admin_send_message_start(update: Update, context: ContextTypes.DEFAULT
     user_id = update.effective_user.id
     
     if not is_admin(user_id):
-        await query.answer("❌ Siz ruxsati yo'q.", show_alert=True)
+        await query.answer(_t(context, 'no_permission'), show_alert=True)
         return ADMIN_MENU
     
     await query.edit_message_text(
-        "📝 Barcha foydalanuvchilarga yuborish uchun xabar yuboring:\n\n"
-        "_Admin panelga qaytish uchun /cancel yuboring_",
+        _t(context, 'ask_broadcast'),
         parse_mode='Markdown'
     )
     
@@ -76,28 +346,130 @@ async def admin_message_input(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.effective_user.id
     
     if not is_admin(user_id):
-        await update.message.reply_text("❌ You don't have permission.")
+        await reply_text(update.message, _t(context, 'no_permission'))
         return SENDING_MESSAGE
     
-    # Store message in context (store the full message object for copying)
+    # Store message in context (copied to users with copy_message)
     context.user_data['broadcast_message'] = update.message
     
     # Show confirmation
-    keyboard = [
-        [InlineKeyboardButton("✅ Tasdiqlash va yuborish", callback_data='confirm_send_message')],
-        [InlineKeyboardButton("❌ Bekor qilish", callback_data='admin_cancel_send')]
-    ]
-    
-    await update.message.reply_text(
-        "✅ Xabar qabul qilindi.\n\n"
-        "Siz bu xabarni barcha foydalanuvchilarga yubormoqchimisiz?",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+    await reply_text(
+        update.message,
+        _t(context, 'confirm_broadcast'),
+        reply_markup=_confirm_markup(_lang(context)),
         parse_mode='Markdown'
     )
     
     return CONFIRMING_MESSAGE
 
 
+async def _send_wave(send, chat_ids):
+    """Send to a batch of chats at once, returns (chat_id, result) pairs"""
+    results = await asyncio.gather(
+        *(throttler.send(send(chat_id=chat_id), chat_id=chat_id) for chat_id in chat_ids),
+        return_exceptions=True
+    )
+    return zip(chat_ids, results)
+
+
+async def _broadcast(send, job_id, job):
+    """Send to a broadcast job's pending users in rate-limited waves"""
+    # Users hit by flood control or network errors get one more try at the end
+    retry_queue = deque()
+    # (chat_id, error type) pairs, logged once at the end instead of per user
+    failures = []
+    log_each = logger.isEnabledFor(logging.DEBUG)
+
+    async def run_wave(chat_ids, final):
+        # Longest flood-control wait Telegram asked for in this wave
+        retry_after = 0
+        statuses = []
+        for chat_id, result in await _send_wave(send, chat_ids):
+            # BadRequest subclasses NetworkError but is permanent (chat not
+            # found, message deleted), so it is never retried
+            if (not final and isinstance(result, (RetryAfter, NetworkError))
+                    and not isinstance(result, BadRequest)):
+                # Stays pending until the retry pass
+                retry_queue.append(chat_id)
+                if isinstance(result, RetryAfter):
+                    retry_after = max(retry_after, result.retry_after)
+            elif isinstance(result, Exception):
+                if log_each:
+                    logger.debug("Failed to send message to user %s: %s", chat_id, result)
+                failures.append((chat_id, type(result).__name__))
+                statuses.append(('failed', chat_id))
+                job['failed'] += 1
+            else:
+                statuses.append(('sent', chat_id))
+                job['sent'] += 1
+        # Persist per wave so a crashed broadcast never re-sends to delivered users
+        await run_db(db.set_broadcast_statuses, job_id, statuses)
+        return retry_after
+
+    # Pending users are streamed from the database chunk by chunk, off the event loop
+    pending = db.iter_pending_broadcast(job_id)
+    # Wait before the next wave, stretched to honour flood control
+    pause = None
+    while (chat_ids := await run_db(next, pending, None)) is not None:
+        for i in range(0, len(chat_ids), BROADCAST_BATCH_SIZE):
+            if pause is not None:
+                await asyncio.sleep(pause)
+            retry_after = await run_wave(chat_ids[i:i + BROADCAST_BATCH_SIZE], final=False)
+            if retry_after:
+                logger.info("Flood control hit, pausing broadcast for %ss", retry_after)
+            pause = max(retry_after, BROADCAST_BATCH_DELAY)
+
+    if retry_queue:
+        logger.info("Retrying %d users", len(retry_queue))
+        await asyncio.sleep(pause)
+    while retry_queue:
+        batch = [retry_queue.popleft() for _ in range(min(BROADCAST_BATCH_SIZE, len(retry_queue)))]
+        await run_wave(batch, final=True)
+        if retry_queue:
+            await asyncio.sleep(BROADCAST_BATCH_DELAY)
+
+    if failures:
+        logger.warning("broadcast failures: %d, sample=%s", len(failures), failures[:20])
+
+
+async def _run_broadcast(bot, job_id, job, send, chat_id, message_id, lang):
+    """Background task running a broadcast job, edits the status message when done"""
+    try:
+        await _broadcast(send, job_id, job)
+    except Exception as e:
+        logger.error("Broadcast %s stopped: %s", job_id, e)
+    finally:
+        job['done'] = True
+    # Reached unless the task was cancelled at shutdown, in which case the job
+    # stays pending and is resumed at the next start; the counts live on in job
+    await run_db(db.delete_broadcast_job, job_id)
+    
+    try:
+        await bot.edit_message_text(
+            _broadcast_status_text(lang, job),
+            chat_id=chat_id,
+            message_id=message_id,
+            reply_markup=_back_markup(lang),
+            parse_mode='Markdown'
+        )
+    except TelegramError as e:
+        logger.warning("Could not update broadcast %s status message: %s", job_id, e)
+
+
+def _broadcast_status_text(lang: str, job: dict) -> str:
+    """Format the progress or result of a broadcast job"""
+    if job['done']:
+        return _text(
+            lang, 'broadcast_done',
+            success=job['sent'], failed=job['failed'], total=job['total']
+        )
+    return _text(
+        lang, 'broadcast_progress',
+        sent=job['sent'], failed=job['failed'],
+        left=job['total'] - job['sent'] - job['failed'], total=job['total']
+    )
+
+
 async def confirm_and_send_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Confirm and send message to all users (without sender attribution)"""
     query = update.callback_query
@@ -106,157 +478,127 @@ async def confirm_and_send_message(update: Update, context: ContextTypes.DEFAULT
     user_id = update.effective_user.id
     
     if not is_admin(user_id):
-        await query.answer("❌ Siz ruxsati yo'q.", show_alert=True)
+        await query.answer(_t(context, 'no_permission'), show_alert=True)
         return ADMIN_MENU
     
     message = context.user_data.get('broadcast_message')
     
     if not message:
-        await query.edit_message_text("❌ Xabar topilmadi. Iltimos qayta urinib ko'ring.")
+        await query.edit_message_text(_t(context, 'message_not_found'))
         return ADMIN_MENU
     
-    # Get all users
-    all_users = db.get_all_users()
+    # copy_message sends any content type without the "forwarded from" header
+    send = partial(
+        context.bot.copy_message,
+        from_chat_id=message.chat_id,
+        message_id=message.message_id
+    )
+    
+    # Queue every user as a pending row of a new broadcast job
+    lang = _lang(context)
+    job_id = await run_db(
+        db.create_broadcast_job,
+        message.chat_id, message.message_id,
+        query.message.chat_id, query.message.message_id, lang
+    )
+    progress = await run_db(db.get_broadcast_progress, job_id)
+    total_users = sum(progress.values())
     
-    if not all_users:
-        await query.edit_message_text("⚠️ Xabar yuborish uchun foydalanuvchi yo'q.")
+    if not total_users:
+        await query.edit_message_text(_t(context, 'no_users'))
         return ADMIN_MENU
     
-    # Send message to all users (without forwarding to hide sender)
-    success_count = 0
-    failed_count = 0
+    # Send in the background so the handler doesn't block for the whole broadcast
+    job = {'total': total_users, 'sent': 0, 'failed': 0, 'done': False}
+    context.bot_data.setdefault('broadcasts', {})[job_id] = job
     
     await query.edit_message_text(
-        f"📤 {len(all_users)} ta foydalanuvchiga xabar yuborilmoqda...\n"
-        f"Iltimos kuting..."
+        _t(context, 'broadcast_started', total=total_users),
+        reply_markup=_broadcast_status_markup(lang, job_id)
     )
     
-    for user in all_users:
-        try:
-            # Copy message content instead of forwarding (hides sender name)
-            if message.text:
-                await context.bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=message.text
-                )
-            elif message.photo:
-                await context.bot.send_photo(
-                    chat_id=user.telegram_id,
-                    photo=message.photo[-1].file_id,
-                    caption=message.caption
-                )
-            elif message.video:
-                await context.bot.send_video(
-                    chat_id=user.telegram_id,
-                    video=message.video.file_id,
-                    caption=message.caption
-                )
-            elif message.document:
-                await context.bot.send_document(
-                    chat_id=user.telegram_id,
-                    document=message.document.file_id,
-                    caption=message.caption
-                )
-            elif message.audio:
-                await context.bot.send_audio(
-                    chat_id=user.telegram_id,
-                    audio=message.audio.file_id,
-                    caption=message.caption
-                )
-            elif message.animation:
-                await context.bot.send_animation(
-                    chat_id=user.telegram_id,
-                    animation=message.animation.file_id,
-                    caption=message.caption
-                )
-            elif message.voice:
-                await context.bot.send_voice(
-                    chat_id=user.telegram_id,
-                    voice=message.voice.file_id,
-                    caption=message.caption
-                )
-            elif message.video_note:
-                await context.bot.send_video_note(
-                    chat_id=user.telegram_id,
-                    video_note=message.video_note.file_id
-                )
-            elif message.sticker:
-                await context.bot.send_sticker(
-                    chat_id=user.telegram_id,
-                    sticker=message.sticker.file_id
-                )
-            elif message.location:
-                await context.bot.send_location(
-                    chat_id=user.telegram_id,
-                    latitude=message.location.latitude,
-                    longitude=message.location.longitude
-                )
-            elif message.contact:
-                await context.bot.send_contact(
-                    chat_id=user.telegram_id,
-                    phone_number=message.contact.phone_number,
-                    first_name=message.contact.first_name,
-                    last_name=message.contact.last_name
-                )
-            elif message.venue:
-                await context.bot.send_venue(
-                    chat_id=user.telegram_id,
-                    latitude=message.venue.location.latitude,
-                    longitude=message.venue.location.longitude,
-                    title=message.venue.title,
-                    address=message.venue.address
-                )
-            elif message.poll:
-                await context.bot.send_poll(
-                    chat_id=user.telegram_id,
-                    question=message.poll.question,
-                    options=[option.text for option in message.poll.options],
-                    is_anonymous=message.poll.is_anonymous,
-                    type=message.poll.type,
-                    allows_multiple_answers=message.poll.allows_multiple_answers
-                )
-            elif message.dice:
-                await context.bot.send_dice(
-                    chat_id=user.telegram_id,
-                    emoji=message.dice.emoji
-                )
-            elif message.game:
-                await context.bot.send_game(
-                    chat_id=user.telegram_id,
-                    game_short_name=message.game.game_short_name
-                )
-            else:
-                logger.warning(f"Unsupported message type for user {user.telegram_id}")
-                failed_count += 1
-                continue
-                
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send message to user {user.telegram_id}: {e}")
-            failed_count += 1
-    
-    # Show result
-    result_text = (
-        f"✅ *Yuborish Tamomlandi*\n\n"
-        f"📊 Natijalar:\n"
-        f"✅ Muvaffaqiyatli yuborildi: {success_count}\n"
-        f"❌ Xato: {failed_count}\n"
-        f"👥 Jami foydalanuvchilar: {len(all_users)}"
+    context.application.create_task(
+        _run_broadcast(
+            context.bot, job_id, job, send,
+            query.message.chat_id, query.message.message_id, lang
+        ),
+        update=update,
+        name=f"broadcast-{job_id}"
     )
     
-    keyboard = [
-        [InlineKeyboardButton("🔙 Admin Panelga Qaytish", callback_data='admin_back_to_panel')]
-    ]
+    return ADMIN_MENU
+
+
+async def resume_broadcasts(application) -> None:
+    """Restart broadcast jobs a previous run didn't finish (post_init callback)"""
+    for job_id, from_chat_id, message_id, chat_id, status_id, lang in await run_db(
+            db.get_unfinished_broadcasts):
+        progress = await run_db(db.get_broadcast_progress, job_id)
+        job = {
+            'total': sum(progress.values()),
+            'sent': progress.get('sent', 0),
+            'failed': progress.get('failed', 0),
+            'done': False
+        }
+        application.bot_data.setdefault('broadcasts', {})[job_id] = job
+        logger.info("Resuming broadcast %s, %d users left", job_id, progress.get('pending', 0))
+        
+        send = partial(
+            application.bot.copy_message,
+            from_chat_id=from_chat_id,
+            message_id=message_id
+        )
+        # The application isn't running yet during post_init, so this is a
+        # plain task; the job keeps a reference to it
+        job['task'] = asyncio.create_task(
+            _run_broadcast(application.bot, job_id, job, send, chat_id, status_id, lang),
+            name=f"broadcast-{job_id}"
+        )
+
+
+async def admin_broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Show progress of a running broadcast"""
+    query = update.callback_query
+    
+    if not is_admin(update.effective_user.id):
+        await query.answer(_t(context, 'no_permission'), show_alert=True)
+        return ADMIN_MENU
     
-    await query.edit_message_text(
-        result_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    job_id = int(query.data.split(':', 1)[1])
+    job = context.bot_data.get('broadcasts', {}).get(job_id)
+    
+    if not job:
+        await query.answer(_t(context, 'broadcast_not_found'), show_alert=True)
+        return ADMIN_MENU
+    
+    await query.answer()
+    lang = _lang(context)
+    markup = _back_markup(lang) if job['done'] else _broadcast_status_markup(lang, job_id)
+    
+    try:
+        await query.edit_message_text(
+            _broadcast_status_text(lang, job),
+            reply_markup=markup,
+            parse_mode='Markdown'
+        )
+    except BadRequest as e:
+        # Telegram rejects edits when nothing changed since the last refresh
+        if 'not modified' not in str(e).lower():
+            raise
     
     return ADMIN_MENU
 
 
+async def _get_admin_stats():
+    """Get admin stats, reusing the last result for STATS_CACHE_TTL seconds"""
+    global _stats_cache
+    if _stats_cache and time.monotonic() - _stats_cache[0] < STATS_CACHE_TTL:
+        return _stats_cache[1]
+    stats = await run_db(db.get_admin_stats)
+    _stats_cache = (time.monotonic(), stats)
+    return stats
+
+
 async def admin_view_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show statistics"""
     query = update.callback_query
@@ -265,59 +607,24 @@ async def admin_view_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     user_id = update.effective_user.id
     
     if not is_admin(user_id):
-        await query.answer("❌ Siz ruxsati yo'q.", show_alert=True)
+        await query.answer(_t(context, 'no_permission'), show_alert=True)
         return ADMIN_MENU
     
     # Get statistics
-    total_users = db.get_users_count()
-    active_users = len(db.get_users_by_status('active'))
-    id_verified = len(db.get_users_by_status('id_verified'))
-    channel_joined = len(db.get_users_by_status('channel_joined'))
-    
-    # Get date-based stats
-    all_users = db.get_all_users()
-    
-    stats_text = (
-        f"📊 *Bot Statistikasi*\n\n"
-        f"👥 *Foydalanuvchi Statistikasi:*\n"
-        f"• Jami Foydalanuvchilar: {total_users}\n"
-        f"• Kanalga Qo'shilganlar: {channel_joined}\n"
-        f"• Faol Foydalanuvchilar: {active_users}\n"
-        f"• ID Tasdiqlanganlar: {id_verified}\n"
-        f"• Tasdiqlanmaganlar: {total_users - id_verified}\n"
-    )
+    stats = await _get_admin_stats()
     
-    # Calculate join date stats
-    if all_users:
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        today_users = sum(1 for u in all_users if u.created_at and 
-                         (now - datetime.fromisoformat(u.created_at)).days == 0)
-        week_users = sum(1 for u in all_users if u.created_at and 
-                        (now - datetime.fromisoformat(u.created_at)).days <= 7)
-        
-        # Channel joined today and this week
-        today_channel = sum(1 for u in all_users if u.status == 'channel_joined' and u.created_at and 
-                           (now - datetime.fromisoformat(u.created_at)).days == 0)
-        week_channel = sum(1 for u in all_users if u.status == 'channel_joined' and u.created_at and 
-                          (now - datetime.fromisoformat(u.created_at)).days <= 7)
-        
-        stats_text += (
-            f"\n📅 *Qo'shilish Statistikasi:*\n"
-            f"• Bugun (Hammasi): {today_users}\n"
-            f"• Bu Hafta (Hammasi): {week_users}\n"
-            f"• Kanal Bugun: {today_channel}\n"
-            f"• Kanal Bu Hafta: {week_channel}\n"
-        )
+    stats_text = _t(
+        context, 'stats',
+        not_verified=stats['total'] - stats['id_verified'], **stats
+    )
     
-    keyboard = [
-        [InlineKeyboardButton("🔙 Admin Panelga Qaytish", callback_data='admin_back_to_panel')],
-        [InlineKeyboardButton("❌ Yopish", callback_data='admin_close')]
-    ]
+    # Join date stats
+    if stats['total']:
+        stats_text += _t(context, 'stats_dates', **stats)
     
     await query.edit_message_text(
         stats_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=_stats_markup(_lang(context)),
         parse_mode='Markdown'
     )
     
@@ -328,31 +635,49 @@ async def admin_back_to_panel(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Go back to admin panel"""
     query = update.callback_query
     
-    keyboard = [
-        [InlineKeyboardButton("📤 Barcha foydalanuvchilarga xabar yuborish", callback_data='admin_send_message')],
-        [InlineKeyboardButton("📊 Statistikani ko'rish", callback_data='admin_view_stats')],
-        [InlineKeyboardButton("❌ Yopish", callback_data='admin_close')]
-    ]
-    
     if query:
         # Called from callback query
         await query.answer()
         await query.edit_message_text(
-            "👨‍💼 *Admin Panel*\n\nAmalni tanlang:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            _t(context, 'panel'),
+            reply_markup=_admin_menu_markup(_lang(context)),
             parse_mode='Markdown'
         )
     else:
         # Called from message (e.g., /cancel command)
-        await update.message.reply_text(
-            "👨‍💼 *Admin Panel*\n\nAmalni tanlang:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+        await reply_text(
+            update.message,
+            _t(context, 'panel'),
+            reply_markup=_admin_menu_markup(_lang(context)),
             parse_mode='Markdown'
         )
     
     return ADMIN_MENU
 
 
+async def admin_reload_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Reload config.json without restarting the bot"""
+    query = update.callback_query
+    
+    if not is_admin(update.effective_user.id):
+        await query.answer(_t(context, 'no_permission'), show_alert=True)
+        return ADMIN_MENU
+    
+    try:
+        invalidate_config()
+    except Exception as e:
+        # Bad files and failing reload hooks are both rolled back, any error
+        # just means the old config stays in use
+        logger.error(f"Error reloading config: {e}")
+        await query.answer(_t(context, 'reload_failed'), show_alert=True)
+        return ADMIN_MENU
+    
+    logger.info(f"Config reloaded by admin {update.effective_user.id}")
+    await query.answer(_t(context, 'reload_done'), show_alert=True)
+    
+    return ADMIN_MENU
+
+
 async def admin_cancel_send(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel sending message"""
     query = update.callback_query
@@ -366,6 +691,6 @@ async def admin_close(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     query = update.callback_query
     await query.answer()
     
-    await query.edit_message_text("✅ Admin panel yopildi.")
+    await query.edit_message_text(_t(context, 'panel_closed'))
     
     return -1
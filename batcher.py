@@ -0,0 +1,64 @@
+"""Coalesced database writes for bursts of user updates"""
+import asyncio
+import logging
+from database import db, run_db
+
+logger = logging.getLogger(__name__)
+
+# A batch is written once it has this many rows, or this long after its first row
+BATCH_MAX_SIZE = 200
+BATCH_MAX_DELAY = 0.1
+
+
+class UpsertBatcher:
+    """Collects user upserts and writes them in one transaction per batch"""
+
+    def __init__(self, max_size: int = BATCH_MAX_SIZE, max_delay: float = BATCH_MAX_DELAY):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def enqueue(self, telegram_id: int, fullname: str, status: str):
+        """Queue a user upsert and wait until its batch has been written"""
+        # Started lazily, there is no running event loop at import time
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="upsert-batcher")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((telegram_id, fullname, status), future))
+        await future
+
+    async def _run(self):
+        """Write queued rows batch by batch, forever"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    @staticmethod
+    async def _flush(batch):
+        """Write one batch and wake up everyone waiting on it"""
+        try:
+            await run_db(db.upsert_many, [row for row, _ in batch])
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} users: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+# Shared batcher for the whole bot
+batcher = UpsertBatcher()
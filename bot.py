@@ -1,7 +1,11 @@
+import asyncio
 import logging
-import json
+import os
 import random
-from pathlib import Path
+import re
+import time
+from types import SimpleNamespace
+from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, ChatMemberUpdated
 from telegram.ext import (
     Application,
@@ -15,17 +19,24 @@ from telegram.ext import (
     ChatJoinRequestHandler,
 )
 from telegram.error import TelegramError
-from database import db, User
+from database import db, run_db, User
+from throttler import throttler, reply_text
+from batcher import batcher
 from admin import (
     admin_panel,
     admin_send_message_start,
     admin_message_input,
     confirm_and_send_message,
+    admin_broadcast_status,
+    resume_broadcasts,
     admin_view_stats,
+    admin_reload_config,
     admin_back_to_panel,
     admin_cancel_send,
     admin_close,
     is_admin,
+    on_config_reload,
+    config,
     ADMIN_MENU,
     SENDING_MESSAGE,
     CONFIRMING_MESSAGE,
@@ -39,24 +50,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Account IDs are exactly 10 ASCII digits
+_ID_RE = re.compile(r'\A[0-9]{10}\Z').match
+
 # States
 MAIN_MENU, CHECKING_SUBSCRIPTION, SENDING_ID, GENERATING_CODE = range(4)
 
-# Load configuration
-CONFIG_PATH = Path(__file__).parent / "config.json"
+# Lucky numbers for the generate step
+_NUMBERS = ("1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣")
+_RNG = random.Random()
+
 
-def load_config():
-    """Load configuration from JSON file"""
-    with open(CONFIG_PATH, 'r') as f:
-        return json.load(f)
+def _freeze(value):
+    """Recursively convert config dicts to namespaces for attribute access"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-config = load_config()
+# Confirmed channel memberships are reused for this many seconds
+MEMBER_CACHE_TTL = 300
+# Expired entries are purged once the cache grows past this size
+MEMBER_CACHE_MAX = 10_000
 
 class TelegramBot:
     def __init__(self):
         self.config = config
+        # (chat_id, user_id) -> monotonic time the membership was confirmed
+        self._member_cache: dict[tuple[int, int], float] = {}
+        self.refresh()
+    
+    def refresh(self):
+        """Precompute keyboards and lookups from config (they don't change per request)"""
+        self.msgs = _freeze(self.config['messages'])
+        self.labels = _freeze(self.config['button_labels'])
+        self._channels_keyboard = self._build_channels_keyboard()
+        self._apps_keyboard = self._build_apps_keyboard()
+        self._app_action_keyboard = self._build_app_action_keyboard()
+        self._id_submission_keyboard = self._build_id_submission_keyboard()
+        self._generate_keyboard = self._build_generate_keyboard()
+        self._back_keyboard = ReplyKeyboardMarkup([[self.labels.back]], resize_keyboard=True)
+        self._generate_reply_keyboard = ReplyKeyboardMarkup(
+            [[self.labels.back, self.labels.generate]],
+            resize_keyboard=True
+        )
+        self._apps_by_name = {app['name']: app for app in self.config['apps']}
+        self._help_label = self.labels.help
+        self._back_label = self.labels.back
+        self._channel_ids = tuple(channel['chat_id'] for channel in self.config['channels'])
+        self.auto_approve_join = self.config.get('features', {}).get('auto_approve_channel_join', True)
         
-    def get_channels_keyboard(self):
+    def _build_channels_keyboard(self):
         """Create inline keyboard with channel links and check button"""
         keyboard = []
         
@@ -69,14 +114,14 @@ class TelegramBot:
         # Add check button
         keyboard.append([
             InlineKeyboardButton(
-                self.config['button_labels']['check'],
+                self.labels.check,
                 callback_data='check_subscription'
             )
         ])
         
         return InlineKeyboardMarkup(keyboard)
     
-    def get_apps_keyboard(self):
+    def _build_apps_keyboard(self):
         """Create reply keyboard with apps and help"""
         keyboard = []
         
@@ -89,79 +134,154 @@ class TelegramBot:
             keyboard.append(row)
         
         # Add help button
-        keyboard.append([f"{self.config['button_labels']['help']}"])
+        keyboard.append([self.labels.help])
         
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    def get_app_action_keyboard(self):
+    def _build_app_action_keyboard(self):
         """Create keyboard for app action (back and next)"""
         keyboard = [
             [
                 InlineKeyboardButton(
-                    self.config['button_labels']['back'],
+                    self.labels.back,
                     callback_data='back_to_main'
                 ),
                 InlineKeyboardButton(
-                    self.config['button_labels']['next'],
+                    self.labels.next,
                     callback_data='next_step'
                 )
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
     
-    def get_id_submission_keyboard(self):
+    def _build_id_submission_keyboard(self):
         """Create keyboard for ID submission step"""
         keyboard = [
             [
                 InlineKeyboardButton(
-                    self.config['button_labels']['back'],
+                    self.labels.back,
                     callback_data='back_to_main'
                 ),
                 InlineKeyboardButton(
-                    self.config['button_labels']['next'],
+                    self.labels.next,
                     callback_data='id_submitted'
                 )
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
     
-    def get_generate_keyboard(self):
+    def _build_generate_keyboard(self):
         """Create keyboard with generate and back buttons"""
         keyboard = [
             [
                 InlineKeyboardButton(
-                    self.config['button_labels']['back'],
+                    self.labels.back,
                     callback_data='back_to_main'
                 ),
                 InlineKeyboardButton(
-                    self.config['button_labels']['generate'],
+                    self.labels.generate,
                     callback_data='generate_code'
                 )
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
     
+    def get_app(self, name):
+        """Get app config by its button name, or None"""
+        return self._apps_by_name.get(name)
+    
+    def is_help(self, text) -> bool:
+        """Check if text is the help button"""
+        return text == self._help_label
+    
+    def is_back(self, text) -> bool:
+        """Check if text is the back button"""
+        return text == self._back_label
+    
+    def get_channels_keyboard(self):
+        """Get inline keyboard with channel links and check button"""
+        return self._channels_keyboard
+    
+    def get_apps_keyboard(self):
+        """Get reply keyboard with apps and help"""
+        return self._apps_keyboard
+    
+    def get_app_action_keyboard(self):
+        """Get keyboard for app action (back and next)"""
+        return self._app_action_keyboard
+    
+    def get_id_submission_keyboard(self):
+        """Get keyboard for ID submission step"""
+        return self._id_submission_keyboard
+    
+    def get_generate_keyboard(self):
+        """Get keyboard with generate and back buttons"""
+        return self._generate_keyboard
+    
+    def get_back_keyboard(self):
+        """Get reply keyboard with just the back button"""
+        return self._back_keyboard
+    
+    def get_generate_reply_keyboard(self):
+        """Get reply keyboard with back and generate buttons"""
+        return self._generate_reply_keyboard
+    
     async def check_user_subscription(self, user_id: int) -> bool:
         """Check if user is subscribed to all channels"""
-        try:
-            for channel in self.config['channels']:
-                # Get member status in channel
-                member = await self.application.bot.get_chat_member(
-                    chat_id=channel['chat_id'],
+        # Only channels without a recent confirmed membership are asked about
+        cutoff = time.monotonic() - MEMBER_CACHE_TTL
+        unchecked = [
+            chat_id for chat_id in self._channel_ids
+            if self._member_cache.get((chat_id, user_id), cutoff) <= cutoff
+        ]
+        if not unchecked:
+            return True
+        
+        # Query the channels at once instead of one round trip per channel
+        results = await asyncio.gather(
+            *(
+                self.application.bot.get_chat_member(
+                    chat_id=chat_id,
                     user_id=user_id
                 )
-                # Check if user is not a member or left
-                if member.status == 'left' or member.status == 'kicked':
-                    return False
-            return True
-        except TelegramError as e:
-            logger.error(f"Error checking subscription: {e}")
-            return False
+                for chat_id in unchecked
+            ),
+            return_exceptions=True
+        )
+        
+        if len(self._member_cache) > MEMBER_CACHE_MAX:
+            self._purge_member_cache()
+        subscribed = True
+        now = time.monotonic()
+        for chat_id, member in zip(unchecked, results):
+            if isinstance(member, TelegramError):
+                logger.error(f"Error checking subscription: {member}")
+                subscribed = False
+            elif isinstance(member, Exception):
+                raise member
+            # Check if user is not a member or left
+            elif member.status in ('left', 'kicked'):
+                subscribed = False
+            else:
+                # Only memberships are cached, so a user who has just joined can re-check at once
+                self._member_cache[(chat_id, user_id)] = now
+        return subscribed
+    
+    def _purge_member_cache(self):
+        """Drop expired membership cache entries"""
+        now = time.monotonic()
+        self._member_cache = {
+            key: checked for key, checked in self._member_cache.items()
+            if now - checked < MEMBER_CACHE_TTL
+        }
 
 bot = TelegramBot()
+# config is shared with admin, so rebuild the cached lookups when it is reloaded
+on_config_reload(bot.refresh)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the bot and show channels"""
+    msgs = bot.msgs
     user = update.effective_user
     logger.info(f"User {user.id} started the bot")
     
@@ -170,20 +290,21 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return await admin_panel(update, context)
     
     # Save or update user in database
-    if not db.user_exists(user.id):
+    if not await run_db(db.user_exists, user.id):
         new_user = User(
             telegram_id=user.id,
             fullname=user.full_name or "Unknown",
             status="active"
         )
-        db.create_user(new_user)
+        await run_db(db.create_user, new_user)
         logger.info(f"New user created: {user.id}")
     else:
-        db.update_user(user.id, fullname=user.full_name)
+        await run_db(db.update_user, user.id, fullname=user.full_name)
         logger.info(f"User updated: {user.id}")
     
-    await update.message.reply_text(
-        config['messages']['start'],
+    await reply_text(
+        update.message,
+        msgs.start,
         reply_markup=bot.get_channels_keyboard()
     )
     
@@ -191,19 +312,21 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Check if user subscribed to all channels"""
+    msgs = bot.msgs
     query = update.callback_query
-    await query.answer()
     
     user_id = update.effective_user.id
     
-    # Simulate subscription check (in production, actually check)
+    # The query is answered once, after the check, since a failed check
+    # answers with an alert
     is_subscribed = await bot.check_user_subscription(user_id)
     
-    if is_subscribed: # or True:  # Set True for testing
+    if is_subscribed:
         logger.info(f"User {user_id} verified subscription")
         await query.answer()
-        await query.message.reply_text(
-            text=config['messages']['check_success'],
+        await reply_text(
+            query.message,
+            text=msgs.check_success,
             reply_markup=bot.get_apps_keyboard()
         )
         # await query.delete_message()
@@ -214,25 +337,24 @@ async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def app_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle app selection"""
+    msgs = bot.msgs
     user = update.effective_user
     text = update.message.text
         
     # Find selected app
-    selected_app = None
-    for app in config['apps']:
-        if app['name'] == text:
-            selected_app = app
-            break
+    selected_app = bot.get_app(text)
     
     if not selected_app:
         # Help button pressed
-        if text == config['button_labels']['help']:
-            await update.message.reply_text(
-                config['messages']['help'],
+        if bot.is_help(text):
+            await reply_text(
+                update.message,
+                msgs.help,
                 reply_markup=ReplyKeyboardRemove()
             )
-            await update.message.reply_text(
-                config['messages']['check_success'],
+            await reply_text(
+                update.message,
+                msgs.check_success,
                 reply_markup=bot.get_apps_keyboard()
             )
             return CHECKING_SUBSCRIPTION
@@ -243,109 +365,108 @@ async def app_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     
     logger.info(f"User {user.id} selected {selected_app['name']}")
     
-    # Send app info with download inline button and "give me id" text
-    app_message = f"{selected_app['info']}\n\n{config['messages']['send_me_your_id']}"
+    # Send app info with download inline button and "give me id" text.
+    # A message carries only one keyboard, so the back button needs its own
+    app_message = f"{selected_app['info']}\n\n{msgs.send_me_your_id}"
     
     keyboard = [
         [InlineKeyboardButton(f"📥 Vzlomlangan {selected_app['name']}", url=selected_app['link'])]
     ]
     
-    await update.message.reply_text(
+    await reply_text(
+        update.message,
         app_message,
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
     
     # Send back button as reply keyboard
-    reply_keyboard = [[config['button_labels']['back']]]
-    await update.message.reply_text(
+    await reply_text(
+        update.message,
         "Shart bajarilgan akkaunt id ni yuboring👇",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True)
+        reply_markup=bot.get_back_keyboard()
     )
     
     return SENDING_ID
 
 async def send_id_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle ID submission"""
+    msgs = bot.msgs
     user = update.effective_user
     text = update.message.text
     
     selected_app = context.user_data.get('selected_app')
     
     # Check which button was pressed
-    if text == config['button_labels']['back']:
+    if bot.is_back(text):
         # Go back to main menu
-        await update.message.reply_text(
-            config['messages']['check_success'],
+        await reply_text(
+            update.message,
+            msgs.check_success,
             reply_markup=bot.get_apps_keyboard()
         )
         return CHECKING_SUBSCRIPTION
     
-    # Check if ID equals 10
-    if len(text) != 10 or not text.isdigit():
-        await update.message.reply_text(
+    # Check if ID is exactly 10 digits
+    if not _ID_RE(text):
+        await reply_text(
+            update.message,
             "❌ Shart bajarilmagan akkaunt id noto'g'ri. Iltimos qayta urinib ko'ring.",
-            reply_markup=ReplyKeyboardMarkup(
-                [[config['button_labels']['back']]],
-                resize_keyboard=True
-            )
+            reply_markup=bot.get_back_keyboard()
         )
         return SENDING_ID
     
     # ID is valid - update user in database
-    db.update_user(user.id, status="id_verified")
+    await run_db(db.update_user, user.id, status="id_verified")
     logger.info(f"User {user.id} verified ID: {text}")
     
     # Show congratulation and generate message
-    keyboard = [
-        [config['button_labels']['back'], config['button_labels']['generate']]
-    ]
-    await update.message.reply_text(
-        text=f"{config['messages']['congratulation_message_prefix']}",
-        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await reply_text(
+        update.message,
+        text=msgs.congratulation_message_prefix,
+        reply_markup=bot.get_generate_reply_keyboard()
     )
     
     return GENERATING_CODE
 
 async def generate_code(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Generate random code"""
+    msgs = bot.msgs
     user = update.effective_user
     text = update.message.text
     
     selected_app = context.user_data.get('selected_app')
     
     # Check which button was pressed
-    if text == config['button_labels']['back']:
+    if bot.is_back(text):
         # Go back to main menu
-        await update.message.reply_text(
-            config['messages']['check_success'],
+        await reply_text(
+            update.message,
+            msgs.check_success,
             reply_markup=bot.get_apps_keyboard()
         )
         return CHECKING_SUBSCRIPTION
-    _numbers = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣"]
     # Generate button pressed - send random code
-    lucky_number = random.randint(0, 4) 
-    message_text = f"{_numbers[lucky_number]} {config['messages']['random_message_prefix']}"
-    
-    
+    lucky_number = _RNG.randrange(len(_NUMBERS))
+    message_text = f"{_NUMBERS[lucky_number]} {msgs.random_message_prefix}"
     
-    keyboard = [
-        [config['button_labels']['back'], config['button_labels']['generate']]
-    ]
-    await update.message.reply_text(
+    await reply_text(
+        update.message,
         text=message_text,
-        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        reply_markup=bot.get_generate_reply_keyboard()
     )
     
     return GENERATING_CODE
 
 async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Go back to main menu"""
+    msgs = bot.msgs
     user = update.effective_user
     text = update.message.text
     
     # Back button pressed from any reply keyboard step
-    await update.message.reply_text(
-        config['messages']['check_success'],
+    await reply_text(
+        update.message,
+        msgs.check_success,
         reply_markup=bot.get_apps_keyboard()
     )
     
@@ -353,21 +474,38 @@ async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel and go back to start"""
-    await update.message.reply_text(
+    await reply_text(
+        update.message,
         "Cancelled. Type /start to begin again.",
         reply_markup=ReplyKeyboardRemove()
     )
     return ConversationHandler.END
 
+async def _send_welcome(telegram_bot, user_id: int, text: str) -> None:
+    """Send the welcome message after a join request is approved"""
+    try:
+        await throttler.send(
+            telegram_bot.send_message(
+                chat_id=user_id,
+                text=text,
+                parse_mode='Markdown'
+            ),
+            chat_id=user_id
+        )
+        logger.info(f"Sent welcome message to user {user_id}")
+    except Exception as e:
+        logger.error(f"Could not send message to user {user_id}: {e}")
+
 async def handle_chat_join_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle channel join requests"""
+    msgs = bot.msgs
     chat_join_request = update.chat_join_request
     
     if not chat_join_request:
         return
     
     # Check if auto approve is enabled
-    if not config.get('features', {}).get('auto_approve_channel_join', True):
+    if not bot.auto_approve_join:
         logger.info(f"Channel join request from user {chat_join_request.from_user.id} - auto approve disabled")
         return
     
@@ -385,37 +523,50 @@ async def handle_chat_join_request(update: Update, context: ContextTypes.DEFAULT
         )
         logger.info(f"✅ Approved join request for user {user_id} in chat {chat_id}")
         
-        # Add user to database if not exists
-        if not db.user_exists(user_id):
-            new_user = User(
-                telegram_id=user_id,
-                fullname=user_name,
-                status="channel_joined"
-            )
-            db.create_user(new_user)
-            logger.info(f"New user added from channel join: {user_id}")
-        else:
-            db.update_user(user_id, status="channel_joined")
-            logger.info(f"Updated user {user_id} status to channel_joined")
+        # Add user to database, or mark an existing one as channel_joined.
+        # Join requests come in bursts, so writes are batched
+        await batcher.enqueue(user_id, user_name, "channel_joined")
+        logger.info(f"Saved user {user_id} from channel join")
         
-        # Send congratulation message to user
-        try:
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=config['messages']['channel_join_approved'],
-                parse_mode='Markdown'
-            )
-            logger.info(f"Sent welcome message to user {user_id}")
-        except Exception as e:
-            logger.error(f"Could not send message to user {user_id}: {e}")
+        # Send congratulation message to user in the background, so the
+        # handler doesn't wait behind the throttler during a join surge
+        context.application.create_task(
+            _send_welcome(context.bot, user_id, msgs.channel_join_approved),
+            update=update,
+            name=f"welcome-{user_id}"
+        )
             
     except Exception as e:
         logger.error(f"Error approving join request for user {user_id}: {e}")
 
+# Only the update types the handlers above use are requested from Telegram
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY, Update.CHAT_JOIN_REQUEST]
+
 def main():
     """Start the bot"""
+    # Settings in .env (see .env.example) fill in unset environment variables
+    load_dotenv()
+    
+    # Upgrade an older database before any handler queries it
+    db.migrate()
+    
     # Create the Application
-    application = Application.builder().token(config['bot_token']).build()
+    # Updates are processed one at a time, as the ConversationHandlers
+    # require; broadcasts run as background tasks, so they don't block it.
+    # Bot API calls share one large connection pool, sized for broadcast waves
+    # plus bursts of user traffic; getUpdates gets its own small pool so
+    # polling never waits behind outgoing sends.
+    application = (
+        Application.builder()
+        .token(config['bot_token'])
+        .connection_pool_size(256)
+        .pool_timeout(20)
+        .connect_timeout(10)
+        .read_timeout(20)
+        .get_updates_connection_pool_size(4)
+        .post_init(resume_broadcasts)
+        .build()
+    )
     
     # Store application in bot instance for subscription checks
     bot.application = application
@@ -447,6 +598,8 @@ def main():
             ADMIN_MENU: [
                 CallbackQueryHandler(admin_send_message_start, pattern='^admin_send_message$'),
                 CallbackQueryHandler(admin_view_stats, pattern='^admin_view_stats$'),
+                CallbackQueryHandler(admin_reload_config, pattern='^admin_reload_config$'),
+                CallbackQueryHandler(admin_broadcast_status, pattern=r'^admin_broadcast_status:\d+$'),
                 CallbackQueryHandler(admin_back_to_panel, pattern='^admin_back_to_panel$'),
                 CallbackQueryHandler(admin_close, pattern='^admin_close$'),
             ],
@@ -474,12 +627,28 @@ def main():
     application.add_handler(admin_conv_handler)
     application.add_handler(conv_handler)
     
-    # Add handler for channel join requests
-    application.add_handler(ChatJoinRequestHandler(handle_chat_join_request))
+    # Add handler for channel join requests. It runs without blocking the
+    # update loop, so a surge of requests waits on the batcher together
+    # instead of one flush at a time
+    application.add_handler(ChatJoinRequestHandler(handle_chat_join_request, block=False))
+    
+    # Run the bot: with a webhook if one is configured, otherwise by polling
+    webhook_url = os.environ.get('WEBHOOK_URL')
+    if webhook_url:
+        logger.info(f"Bot started with webhook {webhook_url}...")
+        application.run_webhook(
+            listen='0.0.0.0',
+            port=int(os.environ.get('WEBHOOK_PORT') or 8443),
+            url_path=config['bot_token'],
+            webhook_url=f"{webhook_url.rstrip('/')}/{config['bot_token']}",
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        logger.info("Bot started polling...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
     
-    # Run the bot
-    logger.info("Bot started polling...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # The bot has stopped, close the shared database connection
+    db.close()
 
 if __name__ == '__main__':
     main()
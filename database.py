@@ -1,19 +1,100 @@
+import asyncio
+import logging
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
+
+logger = logging.getLogger(__name__)
 
 # Database path
 DB_PATH = Path(__file__).parent / "users.db"
 
+# Applied to every new connection. The page cache stays warm because the
+# connection stays open, and synchronous=NORMAL is safe with WAL. Up to
+# 256 MB of the file is memory-mapped, so reads skip a read() call and copy
+PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Size of the connection's prepared statement cache, comfortably larger
+# than the number of distinct queries below
+CACHED_STATEMENTS = 256
+
+# update_user runs one of these fixed statements, so each stays in the
+# statement cache instead of being rebuilt as a new SQL string per call
+UPDATE_FULLNAME_SQL = 'UPDATE users SET fullname = ?, updated_at = ? WHERE telegram_id = ?'
+UPDATE_STATUS_SQL = 'UPDATE users SET status = ?, updated_at = ? WHERE telegram_id = ?'
+UPDATE_BOTH_SQL = 'UPDATE users SET fullname = ?, status = ?, updated_at = ? WHERE telegram_id = ?'
+
+USER_EXISTS_SQL = 'SELECT 1 FROM users WHERE telegram_id = ? LIMIT 1'
+
+# Columns of the users table. telegram_id is the rowid, so lookups by it
+# need no separate index. Timestamps are unix epoch seconds
+USERS_COLUMNS = '''
+    telegram_id INTEGER PRIMARY KEY,
+    fullname TEXT NOT NULL,
+    status TEXT DEFAULT 'active',
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+'''
+
+# Most ids looked up by one statement in get_users (SQLite allows 999 parameters)
+GET_USERS_CHUNK = 500
+
+
+@lru_cache(maxsize=None)
+def _select_users_sql(size: int) -> str:
+    """SELECT for users whose telegram_id is one of size parameters"""
+    return f'''
+        SELECT telegram_id, fullname, status, created_at, updated_at
+        FROM users WHERE telegram_id IN ({", ".join("?" * size)})
+    '''
+
+# Threads for running blocking database calls from async handlers
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db")
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database call without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+# Attributes of a User, in the column order every users query selects them
+USER_FIELDS = ('telegram_id', 'fullname', 'status', 'created_at', 'updated_at')
+
+
 class User:
     """User model"""
-    def __init__(self, telegram_id: int, fullname: str, status: str = "active", created_at: str = None, updated_at: str = None):
+    __slots__ = USER_FIELDS
+
+    def __init__(self, telegram_id: int, fullname: str, status: str = "active", created_at: int = None, updated_at: int = None):
         self.telegram_id = telegram_id
         self.fullname = fullname
         self.status = status
-        self.created_at = created_at or datetime.now().isoformat()
-        self.updated_at = updated_at or datetime.now().isoformat()
+        # One timestamp for both defaults, so a new user's created_at and
+        # updated_at are equal and the clock is read at most once
+        now = None if created_at and updated_at else int(time.time())
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a User from a (telegram_id, fullname, status, created_at, updated_at) row"""
+        # Skips __init__, rows always carry both timestamps
+        user = cls.__new__(cls)
+        user.telegram_id, user.fullname, user.status, user.created_at, user.updated_at = row
+        return user
 
     def __repr__(self):
         return f"User(telegram_id={self.telegram_id}, fullname={self.fullname}, status={self.status})"
@@ -31,163 +112,464 @@ class User:
 class Database:
     """Database operations"""
     
+    # Database files whose schema this process has already set up
+    _initialized: set = set()
+    
     def __init__(self, db_path: Path = DB_PATH):
         self.db_path = db_path
-        self.init_db()
+        # One connection is shared by all threads, the lock serializes its use
+        self._conn = None
+        self._lock = threading.RLock()
+        # Each in-memory database is a new, empty one, so it always needs init
+        if str(db_path) == ":memory:":
+            self.init_db()
+        elif db_path not in Database._initialized:
+            self.init_db()
+            Database._initialized.add(db_path)
     
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get the shared database connection, opening it on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=CACHED_STATEMENTS
+            )
+            if str(self.db_path) != ":memory:":
+                conn.execute("PRAGMA journal_mode = WAL")
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._conn = conn
+        return self._conn
+    
+    @contextmanager
+    def connection(self):
+        """Use the shared connection for one transaction, committed on success"""
+        with self._lock:
+            conn = self.get_connection()
+            with conn:
+                yield conn
+    
+    def close(self):
+        """Close the shared connection (it is reopened if used again)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
     
     def init_db(self):
         """Initialize database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE NOT NULL,
-                fullname TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
+        with self.connection() as conn:
+            # Create users table
+            # An older users table is left as is until migrate() runs
+            conn.execute(f'CREATE TABLE IF NOT EXISTS users ({USERS_COLUMNS})')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)'
             )
-        ''')
+            # Covers every column get_users_by_status selects, so it never
+            # has to visit the table itself
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_users_status_covering
+                ON users(status, telegram_id, fullname, created_at, updated_at)
+            ''')
+            
+            # Create broadcast jobs table (one row per recipient of each broadcast)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                    job_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    PRIMARY KEY (job_id, user_id)
+                )
+            ''')
+            # What each unfinished job sends and where its status message is,
+            # so a job cut short by a restart can be resumed
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    job_id INTEGER PRIMARY KEY,
+                    from_chat_id INTEGER NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    status_chat_id INTEGER NOT NULL,
+                    status_message_id INTEGER NOT NULL,
+                    lang TEXT NOT NULL
+                )
+            ''')
+            
+            # Keep a running user count, so counting doesn't scan the table.
+            # It is seeded once from the existing rows, then maintained by
+            # triggers (upserts that hit a conflict don't fire the insert one)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    k TEXT PRIMARY KEY,
+                    v INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                INSERT OR IGNORE INTO meta (k, v)
+                SELECT 'users_count', COUNT(*) FROM users
+            ''')
+            # Last broadcast job id handed out. Finished jobs' rows are
+            # deleted, so MAX(job_id) can't be used to pick new ids
+            conn.execute('''
+                INSERT OR IGNORE INTO meta (k, v)
+                SELECT 'last_broadcast_job', COALESCE(MAX(job_id), 0) FROM broadcast_jobs
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users
+                BEGIN
+                    UPDATE meta SET v = v + 1 WHERE k = 'users_count';
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users
+                BEGIN
+                    UPDATE meta SET v = v - 1 WHERE k = 'users_count';
+                END
+            ''')
+    
+    def migrate(self) -> bool:
+        """Bring an older users table up to the current schema, returns whether it ran"""
+        with self._lock:
+            conn = self.get_connection()
+            if not self._users_table_outdated(conn):
+                return False
+            
+            backup = None
+            if str(self.db_path) != ":memory:":
+                # VACUUM can't run inside a transaction, so the copy is taken
+                # before the rebuild starts
+                backup = self.db_path.with_name(self.db_path.name + '.bak')
+                backup.unlink(missing_ok=True)
+                conn.execute('VACUUM INTO ?', (str(backup),))
+            logger.warning("Migrating users table in %s to the current schema, backup at %s",
+                           self.db_path, backup)
+            with conn:
+                self._migrate_users_table(conn)
+        # Dropping the old table dropped its indexes and triggers too
+        self.init_db()
+        logger.info("users table migration finished")
+        return True
+    
+    @staticmethod
+    def _users_table_outdated(conn) -> bool:
+        """Whether the users table was created with an older schema"""
+        # Older schemas had a separate id primary key and/or ISO text timestamps
+        column_types = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(users)')}
+        return 'id' in column_types or column_types['created_at'] == 'TEXT'
+    
+    @staticmethod
+    def _migrate_users_table(conn):
+        """Rebuild a users table created with an older schema"""
+        column_types = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(users)')}
+        text_timestamps = column_types['created_at'] == 'TEXT'
         
-        conn.commit()
-        conn.close()
+        if text_timestamps:
+            # The old timestamps are naive local time
+            created_at = "COALESCE(CAST(strftime('%s', created_at, 'utc') AS INTEGER), 0)"
+            updated_at = "COALESCE(CAST(strftime('%s', updated_at, 'utc') AS INTEGER), 0)"
+        else:
+            created_at, updated_at = 'created_at', 'updated_at'
+        
+        # Column types and primary keys can't be altered, so the table is
+        # rebuilt in one transaction
+        conn.execute('BEGIN')
+        conn.execute(f'CREATE TABLE users_new ({USERS_COLUMNS})')
+        conn.execute(f'''
+            INSERT INTO users_new (telegram_id, fullname, status, created_at, updated_at)
+            SELECT telegram_id, fullname, status, {created_at}, {updated_at}
+            FROM users
+        ''')
+        conn.execute('DROP TABLE users')
+        conn.execute('ALTER TABLE users_new RENAME TO users')
     
     def create_user(self, user: User) -> bool:
         """Create a new user"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+        with self.connection() as conn:
+            # An existing telegram_id returns no row instead of raising
+            cursor = conn.execute('''
                 INSERT INTO users (telegram_id, fullname, status, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (telegram_id) DO NOTHING
+                RETURNING 1
             ''', (user.telegram_id, user.fullname, user.status, user.created_at, user.updated_at))
-            
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.IntegrityError:
-            return False
+            return cursor.fetchone() is not None
+    
+    def create_users(self, users: List[User]) -> List[bool]:
+        """Create many users in one transaction, returns which were new"""
+        if not users:
+            return []
+        with self.connection() as conn:
+            # One commit for the whole batch; users that already exist are
+            # skipped instead of failing the transaction
+            created = []
+            for user in users:
+                cursor = conn.execute('''
+                    INSERT INTO users (telegram_id, fullname, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (telegram_id) DO NOTHING
+                ''', (user.telegram_id, user.fullname, user.status, user.created_at, user.updated_at))
+                created.append(cursor.rowcount > 0)
+        return created
+    
+    def upsert_many(self, rows: List[tuple]) -> None:
+        """Create or update (telegram_id, fullname, status) rows in one transaction"""
+        if not rows:
+            return
+        with self.connection() as conn:
+            # Existing users keep their name, only status and updated_at change
+            now = int(time.time())
+            conn.executemany('''
+                INSERT INTO users (telegram_id, fullname, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (telegram_id) DO UPDATE
+                SET status = excluded.status, updated_at = excluded.updated_at
+            ''', [(telegram_id, fullname, status, now, now) for telegram_id, fullname, status in rows])
     
     def get_user(self, telegram_id: int) -> Optional[User]:
         """Get user by telegram_id"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT telegram_id, fullname, status, created_at, updated_at
-            FROM users WHERE telegram_id = ?
-        ''', (telegram_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT telegram_id, fullname, status, created_at, updated_at
+                FROM users WHERE telegram_id = ?
+            ''', (telegram_id,))
+            
+            row = cursor.fetchone()
         
         if row:
-            return User(row[0], row[1], row[2], row[3], row[4])
+            return User.from_row(row)
         return None
     
+    def get_users(self, telegram_ids: List[int]) -> Dict[int, User]:
+        """Get many users by telegram_id, as a dict keyed by telegram_id"""
+        telegram_ids = list(dict.fromkeys(telegram_ids))
+        users = {}
+        with self.connection() as conn:
+            for start in range(0, len(telegram_ids), GET_USERS_CHUNK):
+                chunk = telegram_ids[start:start + GET_USERS_CHUNK]
+                # Pad to a power of two with NULLs (which match nothing), so
+                # only a handful of distinct statements are ever prepared
+                size = min(1 << (len(chunk) - 1).bit_length(), GET_USERS_CHUNK)
+                chunk += [None] * (size - len(chunk))
+                cursor = conn.execute(_select_users_sql(size), chunk)
+                for user in map(User.from_row, cursor):
+                    users[user.telegram_id] = user
+        return users
+    
     def update_user(self, telegram_id: int, fullname: str = None, status: str = None) -> bool:
         """Update user information"""
+        # Always update the updated_at timestamp
+        now = int(time.time())
+        if fullname is not None and status is not None:
+            query, params = UPDATE_BOTH_SQL, (fullname, status, now, telegram_id)
+        elif fullname is not None:
+            query, params = UPDATE_FULLNAME_SQL, (fullname, now, telegram_id)
+        elif status is not None:
+            query, params = UPDATE_STATUS_SQL, (status, now, telegram_id)
+        else:
+            return False
+        
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            update_fields = []
-            params = []
-            
-            if fullname is not None:
-                update_fields.append("fullname = ?")
-                params.append(fullname)
-            
-            if status is not None:
-                update_fields.append("status = ?")
-                params.append(status)
-            
-            if not update_fields:
-                return False
-            
-            # Always update the updated_at timestamp
-            update_fields.append("updated_at = ?")
-            params.append(datetime.now().isoformat())
-            
-            params.append(telegram_id)
-            
-            query = f"UPDATE users SET {', '.join(update_fields)} WHERE telegram_id = ?"
-            cursor.execute(query, params)
-            
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                cursor = conn.execute(query, params)
             return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error updating user: {e}")
+        except sqlite3.Error:
+            logger.exception("Error updating user %s", telegram_id)
             return False
     
     def delete_user(self, telegram_id: int) -> bool:
         """Delete user by telegram_id"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM users WHERE telegram_id = ?', (telegram_id,))
-            
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                cursor = conn.execute('DELETE FROM users WHERE telegram_id = ?', (telegram_id,))
             return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Error deleting user: {e}")
+        except sqlite3.Error:
+            logger.exception("Error deleting user %s", telegram_id)
             return False
     
     def get_all_users(self) -> List[User]:
         """Get all users"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT telegram_id, fullname, status, created_at, updated_at
-            FROM users
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        return list(self.iter_all_users())
+    
+    def export_dicts(self) -> List[Dict]:
+        """Get all users as dicts shaped like User.to_dict, without building Users"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT telegram_id, fullname, status, created_at, updated_at
+                FROM users
+            ''')
+            
+            rows = cursor.fetchall()
         
-        return [User(row[0], row[1], row[2], row[3], row[4]) for row in rows]
+        return [dict(zip(USER_FIELDS, row)) for row in rows]
+    
+    def iter_all_users(self) -> Iterator[User]:
+        """Iterate over all users one by one, without loading them all at once"""
+        # Streams the keyset pages of iter_users rather than one cursor, since
+        # a cursor left open between yields would outlive the connection lock
+        for chunk in self.iter_users():
+            yield from chunk
+    
+    def iter_users(self, chunk_size: int = 1000) -> Iterator[List[User]]:
+        """Iterate over all users in chunks of at most chunk_size"""
+        # Each chunk is a separate keyset query that holds the lock only while
+        # it runs, so the generator can be advanced from any thread (e.g.
+        # run_in_executor) without blocking other database calls in between
+        last_id = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.execute('''
+                    SELECT telegram_id, fullname, status, created_at, updated_at
+                    FROM users WHERE telegram_id > ? ORDER BY telegram_id LIMIT ?
+                ''', (last_id, chunk_size))
+                
+                users = list(map(User.from_row, cursor))
+            
+            if not users:
+                return
+            last_id = users[-1].telegram_id
+            yield users
     
     def user_exists(self, telegram_id: int) -> bool:
         """Check if user exists"""
-        return self.get_user(telegram_id) is not None
+        # Only the rowid is looked up, no columns are read or User built
+        with self.connection() as conn:
+            cursor = conn.execute(USER_EXISTS_SQL, (telegram_id,))
+            return cursor.fetchone() is not None
     
     def get_users_count(self) -> int:
         """Get total number of users"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM users')
-        count = cursor.fetchone()[0]
-        
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.execute("SELECT v FROM meta WHERE k = 'users_count'")
+            count = cursor.fetchone()[0]
         return count
     
     def get_users_by_status(self, status: str) -> List[User]:
         """Get users by status"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT telegram_id, fullname, status, created_at, updated_at
-            FROM users WHERE status = ?
-        ''', (status,))
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT telegram_id, fullname, status, created_at, updated_at
+                FROM users WHERE status = ?
+            ''', (status,))
+            
+            # Users are built straight from the cursor, without an
+            # intermediate list of row tuples
+            return list(map(User.from_row, cursor))
+    
+    def get_admin_stats(self) -> Dict[str, int]:
+        """Get user counts for the admin panel in a single query"""
+        with self.connection() as conn:
+            # Buckets start at local midnight, as epoch seconds they can
+            # range-scan idx_users_created_at
+            midnight = datetime.combine(date.today(), datetime.min.time())
+            params = {
+                "today": int(midnight.timestamp()),
+                "week": int((midnight - timedelta(days=7)).timestamp()),
+            }
+            
+            cursor = conn.execute('''
+                SELECT
+                    COUNT(*),
+                    COUNT(*) FILTER (WHERE status = 'active'),
+                    COUNT(*) FILTER (WHERE status = 'id_verified'),
+                    COUNT(*) FILTER (WHERE status = 'channel_joined'),
+                    (SELECT COUNT(*) FROM users WHERE created_at >= :today),
+                    (SELECT COUNT(*) FROM users WHERE created_at >= :week),
+                    (SELECT COUNT(*) FROM users
+                     WHERE created_at >= :today AND status = 'channel_joined'),
+                    (SELECT COUNT(*) FROM users
+                     WHERE created_at >= :week AND status = 'channel_joined')
+                FROM users
+            ''', params)
+            
+            row = cursor.fetchone()
         
-        rows = cursor.fetchall()
-        conn.close()
+        keys = ("total", "active", "id_verified", "channel_joined",
+                "today_all", "week_all", "today_channel", "week_channel")
+        return dict(zip(keys, row))
+    
+    def create_broadcast_job(self, from_chat_id: int, message_id: int,
+                             status_chat_id: int, status_message_id: int, lang: str) -> int:
+        """Create a broadcast job with every user pending, returns the job id"""
+        with self.connection() as conn:
+            # The id is taken first, in the same transaction, so it is new
+            # even when there are no users to queue
+            cursor = conn.execute('''
+                UPDATE meta SET v = v + 1 WHERE k = 'last_broadcast_job' RETURNING v
+            ''')
+            job_id = cursor.fetchone()[0]
+            cursor = conn.execute('''
+                INSERT INTO broadcast_jobs (job_id, user_id, status)
+                SELECT ?, telegram_id, 'pending' FROM users
+            ''', (job_id,))
+            # A job with no recipients is never run, so nothing is kept for it
+            if cursor.rowcount > 0:
+                conn.execute('''
+                    INSERT INTO broadcasts
+                    (job_id, from_chat_id, message_id, status_chat_id, status_message_id, lang)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (job_id, from_chat_id, message_id, status_chat_id, status_message_id, lang))
+        return job_id
+    
+    def delete_broadcast_job(self, job_id: int) -> None:
+        """Delete a finished broadcast job and its recipient rows"""
+        with self.connection() as conn:
+            conn.execute('DELETE FROM broadcast_jobs WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM broadcasts WHERE job_id = ?', (job_id,))
+    
+    def get_unfinished_broadcasts(self) -> List[tuple]:
+        """Get broadcast jobs left over from an earlier run, oldest first"""
+        with self.connection() as conn:
+            # Recipient rows without a job can't be resumed (older versions
+            # didn't record what they sent), so they are dropped
+            conn.execute('''
+                DELETE FROM broadcast_jobs
+                WHERE job_id NOT IN (SELECT job_id FROM broadcasts)
+            ''')
+            cursor = conn.execute('''
+                SELECT job_id, from_chat_id, message_id, status_chat_id, status_message_id, lang
+                FROM broadcasts ORDER BY job_id
+            ''')
+            return cursor.fetchall()
+    
+    def iter_pending_broadcast(self, job_id: int, chunk_size: int = 100) -> Iterator[List[int]]:
+        """Iterate over telegram_ids still pending in a broadcast job, in chunks"""
+        last_id = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.execute('''
+                    SELECT user_id FROM broadcast_jobs
+                    WHERE job_id = ? AND status = 'pending' AND user_id > ?
+                    ORDER BY user_id LIMIT ?
+                ''', (job_id, last_id, chunk_size))
+                
+                user_ids = [row[0] for row in cursor.fetchall()]
+            
+            if not user_ids:
+                return
+            last_id = user_ids[-1]
+            yield user_ids
+    
+    def set_broadcast_statuses(self, job_id: int, statuses: List[tuple]) -> None:
+        """Update (status, user_id) pairs of a broadcast job"""
+        if not statuses:
+            return
+        with self.connection() as conn:
+            conn.executemany(
+                'UPDATE broadcast_jobs SET status = ? WHERE job_id = ? AND user_id = ?',
+                [(status, job_id, user_id) for status, user_id in statuses]
+            )
+    
+    def get_broadcast_progress(self, job_id: int) -> Dict[str, int]:
+        """Get number of recipients per status of a broadcast job"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT status, COUNT(*) FROM broadcast_jobs
+                WHERE job_id = ? GROUP BY status
+            ''', (job_id,))
+            
+            rows = cursor.fetchall()
         
-        return [User(row[0], row[1], row[2], row[3], row[4]) for row in rows]
+        return dict(rows)
 
 
 # Initialize database
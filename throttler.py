@@ -0,0 +1,98 @@
+"""Rate limiting for outgoing bot messages"""
+import asyncio
+import time
+from collections import deque
+
+# Telegram limits: ~30 messages per second overall, 20 per minute in one
+# group, and about one per second in one private chat
+GLOBAL_RATE = 30
+GLOBAL_PERIOD = 1.0
+CHAT_RATE = 20
+CHAT_PERIOD = 60.0
+PRIVATE_RATE = 1
+PRIVATE_PERIOD = 1.0
+
+# Idle chats are purged once this many are tracked
+MAX_TRACKED_CHATS = 10_000
+
+
+class Throttler:
+    """Sliding-window limiter that all outgoing messages go through"""
+
+    def __init__(self, rate: int = GLOBAL_RATE, period: float = GLOBAL_PERIOD,
+                 chat_rate: int = CHAT_RATE, chat_period: float = CHAT_PERIOD,
+                 private_rate: int = PRIVATE_RATE, private_period: float = PRIVATE_PERIOD):
+        self.period = period
+        # (rate, period) per chat; group and channel ids are negative
+        self._group_limit = (chat_rate, chat_period)
+        self._private_limit = (private_rate, private_period)
+        # Timestamps of the most recent sends, overall and per chat
+        self._sends = deque(maxlen=rate)
+        self._chat_sends = {}
+
+    async def acquire(self, chat_id: int = None):
+        """Wait until one more message may be sent (to chat_id, if given)"""
+        if chat_id is not None:
+            await self._wait(*self._chat_window(chat_id))
+        await self._wait(self._sends, self.period)
+
+    def record(self, chat_id: int = None):
+        """Count a message that is sent right away, without waiting for a slot"""
+        now = time.monotonic()
+        if chat_id is not None:
+            self._chat_window(chat_id)[0].append(now)
+        self._sends.append(now)
+
+    async def send(self, coro, chat_id: int = None):
+        """Await a send coroutine once the rate limit allows it"""
+        try:
+            await self.acquire(chat_id)
+        except BaseException:
+            coro.close()
+            raise
+        return await coro
+
+    def _chat_window(self, chat_id: int):
+        """The (sends, period) window of one chat, created on first use"""
+        rate, chat_period = self._group_limit if chat_id < 0 else self._private_limit
+        sends = self._chat_sends.get(chat_id)
+        if sends is None:
+            if len(self._chat_sends) > MAX_TRACKED_CHATS:
+                self._purge_chats()
+            sends = self._chat_sends[chat_id] = deque(maxlen=rate)
+        return sends, chat_period
+
+    @staticmethod
+    async def _wait(sends: deque, period: float):
+        """Wait for a free slot in the window, then record a send"""
+        while len(sends) == sends.maxlen:
+            delay = sends[0] + period - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        # No await between the check and the append, so this can't overshoot
+        sends.append(time.monotonic())
+
+    def _purge_chats(self):
+        """Forget chats with no sends in the current window"""
+        now = time.monotonic()
+        for chat_id in [
+            chat_id for chat_id, sends in self._chat_sends.items()
+            if not sends or now - sends[-1] >= (
+                self._group_limit if chat_id < 0 else self._private_limit
+            )[1]
+        ]:
+            del self._chat_sends[chat_id]
+
+
+async def reply_text(message, *args, **kwargs):
+    """Reply to a message, counted by the throttler but never held back"""
+    # Updates are handled one at a time, so waiting here would stall every
+    # chat. Replies only follow the user's own messages; counting them makes
+    # broadcasts leave room for them in the global window
+    throttler.record(message.chat_id)
+    return await message.reply_text(*args, **kwargs)
+
+
+# Shared throttler for the whole bot
+throttler = Throttler()